@@ -16,12 +16,13 @@ https://github.com/noahmanz/Optimizing-the-Combination-of-Natural-Pigments-for-C
 
 ################### Import relevant libraries ###################
 
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, combinations
+from math import comb
 import numpy as np # Version 1.21.6 used
 from matplotlib import pyplot as plt # Version 3.5.1 used
-import scipy.integrate as integrate # Version 1.7.3 used
-from scipy.stats import pearsonr # Version 1.7.3 used
-from scipy import interpolate # Version 1.7.3 used
-from tqdm import tqdm # Version 4.64.0 used
+from scipy.spatial import KDTree # Version 1.7.3 used
+from scipy.spatial.distance import cdist # Version 1.7.3 used
 
 
 
@@ -39,15 +40,27 @@ wavelength = np.linspace(340, 800, 461)
 # wavelength = np.linspace(lower_bound, upper_bound, upper_bound - upper_bound + 1)
 # Note: Ensure that these wavelength limits match those contained in the UVVIS_Absorbance csv files
 
+# Step size of the wavelength domain
+dx = wavelength[1] - wavelength[0]
 
-# Calculate polynomial regression of the NREL data
-spectrum_regression = np.poly1d(np.polyfit(spectrum[: ,0], spectrum[:, 1], 6))
+# Define function to integrate a spectrum (or every row of a matrix of spectra) over the wavelength domain
+# Note: On a uniform grid the trapezoidal rule reduces to dx * (sum of all values - half of the first and last values)
+def trapezoid(y):
+    
+    return dx * (y.sum(axis = -1) - 0.5 * (y[..., 0] + y[..., -1]))
+
+
+# Calculate coefficients of the polynomial regression of the NREL data
+regression_coefficients = np.polyfit(spectrum[: ,0], spectrum[:, 1], 6)
+
+# Evaluate the regression once over the wavelength domain
+solar = np.polyval(regression_coefficients, wavelength)
 
 # Calculate integral of regression for normalization
-spectrum_integral = integrate.trapezoid(spectrum_regression(wavelength), wavelength)
+spectrum_integral = trapezoid(solar)
 
 # Normalized irradiance spectrum
-normal_spectrum = spectrum_regression(wavelength) / spectrum_integral
+normal_spectrum = solar / spectrum_integral
 
 # Define function to plot solar irradiance spectrum if allow = True
 def plotsolarirradiance(allow = True):
@@ -55,7 +68,7 @@ def plotsolarirradiance(allow = True):
     if allow:
         
         plt.figure(0)
-        plt.plot(wavelength, spectrum_regression(wavelength), color = 'r', linewidth = 3, label = 'Regression')
+        plt.plot(wavelength, solar, color = 'r', linewidth = 3, label = 'Regression')
         plt.scatter(spectrum[:, 0], spectrum[:, 1], marker = '.', label = 'NREL Data')
         plt.xlabel('Wavelength (nm)')
         plt.ylabel('Spectral Irradiance (W*$m^{-2}$*$nm^{-1}$)')
@@ -83,31 +96,28 @@ v = np.linspace(0, 1, N)
 # Print step size of volume fraction array in console
 print(f"Resolution of the volume fraction array is: {v[1] - v[0]} \n")
 
-# Generate meshgrid to make coordinate pairs representing all dye combinations
-v1, v2, v3, v4, v5, v6 = np.meshgrid(v, v, v, v, v, v, indexing = 'ij')
+# Define number of constituent dyes
+D = 6
 
-# If you are evaluating more than 6 dyes, (e.g 7), adjust line 82 as follows:
-# v1, v2, v3, v4, v5, v6, v7 = np.meshgrid(v, v, v, v, v, v, v, indexing = 'ij')
+# If you are evaluating more than 6 dyes, (e.g 7), adjust the line above as follows:
+# D = 7
 
-# Calculate the sum of each coordinate pair at every point
-Sum = v1 + v2 + v3 + v4 + v5 + v6
+# Enumerate every way of distributing the N - 1 volume fraction steps among the D dyes (stars and bars)
+# Note: Each combination of D - 1 "bar" positions among N + D - 2 slots corresponds to exactly one combination
+    # summing to 1, so no impossible combinations are generated and no floating point sum has to be compared to 1
+# Note: The bar positions are written straight into a preallocated integer array instead of a Python list of tuples
+n_combinations = comb(N + D - 2, D - 1)
+bars = np.fromiter(chain.from_iterable(combinations(range(N + D - 2), D - 1)), dtype = np.int64,
+                   count = n_combinations * (D - 1)).reshape(n_combinations, D - 1)
 
-# If you are evaluating more than 6 dyes, (e.g 7), adjust line 88 as follows:
-# Sum = v1 + v2 + v3 + v4 + v5 + v6 + v7
+# Count the steps between consecutive bars to obtain the number of steps assigned to each dye
+steps = np.diff(bars, axis = 1, prepend = -1, append = N + D - 2) - 1
 
-# Boolean logic to remove impossible combinations. Returns true only when Sum=1
-condition = Sum == 1
+# Convert steps to volume fractions, one combination per row and one constituent dye per column
+V1, V2, V3, V4, V5, V6 = (steps / (N - 1)).T
 
-# Use boolean on meshgrid to only return coordinate pairs that sum to 1
-V1 = v1[condition]
-V2 = v2[condition]
-V3 = v3[condition]
-V4 = v4[condition]
-V5 = v5[condition]
-V6 = v6[condition]
-
-# If you are evaluating more than 6 dyes, (e.g 7), add the following after V6:
-# V7 = v7[condition]
+# If you are evaluating more than 6 dyes, (e.g 7), adjust the line above as follows:
+# V1, V2, V3, V4, V5, V6, V7 = (steps / (N - 1)).T
 
 # Print total number of dye combinations in console
 print(f"The total number of combinations is: {len(V1)} \n")
@@ -120,362 +130,376 @@ print(f"The total number of combinations is: {len(V1)} \n")
 # Import volume fractions file corresponding to each analyzed dye combination
 # Note: This is a .csv file containing any dye combinations for which UV/VIS data was collected
     # Volume fractions of constituents should populate columns with each combination populating a new row
-volume_fractions_w_header = np.genfromtxt('Emperical_Dye_Solutions_Volume_Fractions.csv', delimiter = ',')
-
-# Delete header and first column with variable labels
-volume_fractions = np.delete(np.delete(volume_fractions_w_header, 0, 0), 0, 1)
+    # The header row and first column with variable labels are skipped while reading
+    # Values are read in single precision, which halves the memory traffic of the RBF kernel matrix products
+    # and is still more precise than the measurements themselves
+volume_fractions = np.loadtxt('Empirical_Dye_Solutions_Volume_Fractions.csv', delimiter = ',', skiprows = 1,
+                              usecols = range(1, D + 1), dtype = np.float32)
 
 # Import the corresponding UV VIS [absorbance] data and set any negative values to zero
 # Note: This is the spectral UV/VIS data corresponding to each combination in "Independent_Variables.csv"
     # Each combination populates a column with wavelength values corresponding to individual rows
     # Either the anode adsorbed or bulk solution data can be passed as an argument here
-data_w_header = np.clip(np.genfromtxt('UVVIS_Absorbance_Bulk_Solution.csv', delimiter = ','), 0, None)
+    # The header row with labels is skipped while reading
+data = np.loadtxt('UVVIS_Absorbance_Bulk_Solution.csv', delimiter = ',', skiprows = 1, dtype = np.float32)
+np.maximum(data, 0, out = data)
+
+# Calculate the RBF shape parameter from the average spacing of the measured combinations
+# Note: This is the default epsilon of the legacy scipy.interpolate.Rbf used to generate the published results
+edges = np.ptp(volume_fractions, axis = 0)
+edges = edges[np.nonzero(edges)]
+epsilon = np.power(np.prod(edges) / len(volume_fractions), 1 / edges.size)
+
+# Define the 'inverse' (inverse multiquadric) radial basis function of the legacy scipy.interpolate.Rbf
+def kernel(r):
+    
+    return 1 / np.sqrt((r / epsilon) ** 2 + 1)
 
-# Delete header row with labels
-data = np.delete(data_w_header, 0, 0)
+# Calculate the RBF Gram matrix between all measured combinations
+gram = kernel(cdist(volume_fractions, volume_fractions))
 
-# Break the volume fraction matrix into individual vectors corresponding to each constituent dye
-d1 = volume_fractions[:, 0]
-d2 = volume_fractions[:, 1]
-d3 = volume_fractions[:, 2]
-d4 = volume_fractions[:, 3]
-d5 = volume_fractions[:, 4]
-d6 = volume_fractions[:, 5]
+# Solve for the RBF weights of "data" at all 461 wavelengths at once
+# Note: Each column of "weights" holds the RBF weights of one wavelength, so the kernel distances of a
+    # combination are evaluated only once and shared by every wavelength
+    # The (small) system is solved in double precision and the weights are stored contiguously in single precision
+weights = np.ascontiguousarray(np.linalg.solve(gram, data.T), dtype = np.float32)
 
-# If you are evaluating more than 6 dyes, (e.g 7), add the following after d6:
-# d7 = volume_fractions[:, 6]
- 
-# Create storage array to hold all RBF models
-RBF = []
+# Option to interpolate each combination only from its nearest measured combinations (local RBF)
+# Note: neighbors is a user input. None uses every measured combination, which reproduces the published results.
+    # An integer uses only that many nearest measured combinations, which is faster when many combinations were measured
+neighbors = None
 
-# Iterate through "data" and generate all 461 RBF models
-for index, _ in enumerate(data):
+if neighbors is not None:
     
-    # Calculate an RBF interpolation of "data" for each wavelength
-    interpolation = interpolate.Rbf(d1, d2, d3, d4, d5, d6, data[index, :], function = 'inverse')
+    # Build a k-d tree of the measured combinations for nearest neighbor queries
+    tree = KDTree(volume_fractions)
+
+# Option to evaluate the RBF model on a CUDA GPU
+# Note: use_gpu is a user input. Setting it to True requires CuPy and a CUDA capable GPU
+    # It cannot be combined with the nearest neighbor (local RBF) path, which only runs on the CPU, and it takes
+    # priority over use_numba
+    # This path has been checked against the NumPy path with NumPy standing in for CuPy, but not yet on an actual GPU
+use_gpu = False
+
+if use_gpu:
     
-    # If you are evaluating more than 6 dyes, (e.g 7), adjust line 150 as follows:
-    # interpolation = interpolate.Rbf(d1, d2, d3, d4, d5, d6, d7, data[index, :], function = 'inverse')
+    if neighbors is not None:
+        raise ValueError('use_gpu = True cannot be combined with neighbors. Set neighbors = None to use the GPU')
     
-    # Append this result to the RBF list
-    RBF.append(interpolation)
+    import cupy as cp
     
+    # Copy the measured combinations and RBF weights to the GPU once
+    volume_fractions_gpu = cp.asarray(volume_fractions)
+    weights_gpu = cp.asarray(weights)
 
-# Define function F to return the RBF model over entire wavelength domain
 
-def F(I1, I2, I3, I4, I5, I6):
-    
-    # If you are evaluating more than 6 dyes, (e.g 7), adjust line 161 as follows:
-    # def F(I1, I2, I3, I4, I5, I6, I7):
+# Natural logarithm of 10 to convert absorbance to LHE with the exponential function
+ln10 = np.log(10)
+
+
+# Option to evaluate the RBF model with a compiled, multithreaded Numba loop
+# Note: use_numba is a user input. Setting it to True requires Numba. The loop is compiled on every run (about 2 s)
+    # and is usually slower than the default NumPy path, whose kernel matrix product already runs on multithreaded BLAS
+use_numba = False
+
+if use_numba:
     
-    # Create temporary storage vector to hold the results of the RBF model
-    temp_storage = []
+    from numba import njit, prange
     
-    # Iterate through the UV/VIS dataset
-    for index, _ in enumerate(data):
+    # Define Numba function to evaluate the RBF model and convert absorbance to LHE, one combination per thread
+    # Note: This is the same calculation as the NumPy path of F_block below, written as explicit loops over
+        # combinations, measured combinations and wavelengths
+    @njit(parallel = True, fastmath = True)
+    def eval_lhe(Q, C, W, epsilon):
+        
+        L = np.zeros((Q.shape[0], W.shape[1]))
         
-            # Evaluate the RBF model
-            RBF_absorbance_value = RBF[index](I1, I2, I3, I4, I5, I6)
+        for i in prange(Q.shape[0]):
             
-            # If you are evaluating more than 6 dyes, (e.g 7), adjust line 173 as follows:
-            # RBF_absorbance_value = RBF[index](I1, I2, I3, I4, I5, I6, I7)
+            for s in range(C.shape[0]):
+                
+                # Evaluate the RBF kernel between combination i and measured combination s
+                d2 = 0.0
+                for j in range(C.shape[1]):
+                    d2 += (Q[i, j] - C[s, j]) ** 2
+                k = 1 / np.sqrt(d2 / epsilon ** 2 + 1)
+                
+                # Accumulate the weighted kernel into the absorbance spectrum of combination i
+                for w in range(W.shape[1]):
+                    L[i, w] += k * W[s, w]
             
-            # Convert absorbance to LHE and append to storage vector
-            # Note: LHE = 1 - Trans. --> LHE = 1 - 10 ^ -Abs.
-            # Reference: http://www.rsc.org/suppdata/ee/c2/c2ee22854h/c2ee22854h.pdf
-            temp_storage.append(1 - 10 ** (- RBF_absorbance_value))
-    
-    # Return the storage vector when F is called
-    return np.array(temp_storage)
-
-
+            # Convert absorbance to LHE
+            for w in range(W.shape[1]):
+                L[i, w] = - np.expm1(- ln10 * L[i, w])
+        
+        return L
 
 
-################### Loop through all dye possible combinations ###################
+# Define function F_block to return the RBF model over entire wavelength domain for a block of combinations
+# Note: "points" has one combination per row and one constituent dye per column. The result has one LHE spectrum per row
 
-# Create empty array to store correlation fit data
-correlation = []
+def F_block(points):
     
-# Create empty array to store fit data
-integral = []
+    if neighbors is not None:
+        
+        # Find the nearest measured combinations of every combination in "points"
+        # Note: neighbors is limited to the number of measured combinations, and the indices are reshaped so
+            # that neighbors = 1 also returns one row of indices per combination
+        k = min(neighbors, len(volume_fractions))
+        _, yindices = tree.query(points, k = k)
+        yindices = np.reshape(yindices, (len(points), k))
+        
+        # Group the combinations sharing the same set of nearest measured combinations
+        yindices, inverse = np.unique(np.sort(yindices, axis = 1), axis = 0, return_inverse = True)
+        inverse = inverse.ravel()
+        
+        # Create storage array to hold the LHE spectra of the block
+        LHE_block = np.empty((len(points), weights.shape[1]))
+        
+        # Solve a local RBF model for every set of nearest measured combinations and evaluate it
+        for group, yindex in enumerate(yindices):
+            
+            centers = volume_fractions[yindex]
+            local_weights = np.linalg.solve(kernel(cdist(centers, centers)), data.T[yindex])
+            members = inverse == group
+            K = kernel(cdist(points[members], centers))
+            LHE_block[members] = - np.expm1(- ln10 * (K @ local_weights))
+        
+        return LHE_block
     
-# Create empty array to store fit data
-covariance = []
-
-# Loop through all rows in volume fraction meshgrid
-for f1, f2, f3, f4, f5, f6 in tqdm(zip(V1, V2, V3, V4, V5, V6), desc = "Evaluating combinations", total = len(V1)):
+    if use_gpu:
+        
+        # Evaluate the RBF kernel and model on the GPU and copy the LHE spectra back to the host
+        Q = cp.asarray(points)
+        K = kernel(cp.sqrt(((Q[:, None, :] - volume_fractions_gpu[None, :, :]) ** 2).sum(axis = 2)))
+        return cp.asnumpy(- cp.expm1(- ln10 * (K @ weights_gpu)))
+    
+    if use_numba:
+        return eval_lhe(points, volume_fractions, weights, epsilon)
     
-    # If you are evaluating more than 6 dyes, (e.g 7), adjust line 201 as follows:
-    # for f1, f2, f3, f4, f5, f6, f7 in tqdm(zip(V1, V2, V3, V4, V5, V6, V7), desc = "Evaluating combinations", total = len(V1)):
+    # Evaluate the RBF kernel between every combination in "points" and every measured combination
+    K = kernel(cdist(points, volume_fractions).astype(np.float32))
+    
+    # Evaluate the RBF model and convert absorbance to LHE
+    # Note: LHE = 1 - Trans. --> LHE = 1 - 10 ^ -Abs. = -expm1(-ln(10) * Abs.)
+    # Reference: http://www.rsc.org/suppdata/ee/c2/c2ee22854h/c2ee22854h.pdf
+    return - np.expm1(- ln10 * (K @ weights))
+
 
+# Define number of combinations evaluated by F_block at once
+# Note: This bounds the size of the temporary distance and kernel matrices so they stay in cache (or GPU memory)
+chunk_size = 1024
 
-    ################### Find the Pearson Correlation for all combinations ###################
+# Define number of threads evaluating blocks of combinations in parallel
+# Note: n_jobs is a user input. The blocks are independent and only read the RBF weights, and NumPy releases the GIL
+    # while evaluating them. Multithreaded BLAS already uses several cores, so n_jobs > 1 mostly pays off for the
+    # nearest neighbor (local RBF) path. n_jobs does nothing on the Numba path, whose parallel loop must not be
+    # called from several threads at once
+n_jobs = 1
 
-    # Calculate correlation between solar irradiance and F evaluated at fractions f1-f6
-    corr = pearsonr(spectrum_regression(wavelength), F(f1, f2, f3, f4, f5, f6))
+# Define function F_all to return the RBF model over entire wavelength domain for an array of combinations
+
+def F_all(points):
     
-    # If you are evaluating more than 6 dyes, (e.g 7), adjust line 210 as follows:
-    # corr = pearsonr(spectrum_regression(wavelength), F(f1, f2, f3, f4, f5, f6, f7))
+    points = np.ascontiguousarray(np.atleast_2d(points), dtype = np.float32)
     
-    # Append the previous value to the correlation storage array
-    correlation.append(corr[0])
+    # Create storage array to hold the LHE spectra of all combinations
+    LHE_points = np.empty((len(points), weights.shape[1]))
     
-
-    ################### Find the integral value for all combinations ###################
-
-    # Define function to return the integral of the RBF model over domain
-    def I(I1, I2, I3, I4, I5, I6):
-        
-        # If you are evaluating more than 6 dyes, (e.g 7), adjust line 222 as follows:
-        # def I(I1, I2, I3, I4, I5, I6, I7):
+    # Define function to evaluate the RBF model for the block of chunk_size combinations beginning at 'start'
+    def evaluate_block(start):
         
-        return integrate.trapezoid(F(I1, I2, I3, I4, I5, I6), wavelength)
+        LHE_points[start:start + chunk_size] = F_block(points[start:start + chunk_size])
     
-        # If you are evaluating more than 6 dyes, (e.g 7), adjust line 227 as follows:
-        # return integrate.trapezoid(F(I1, I2, I3, I4, I5, I6, I7), wavelength)
-
-    # Integrate F evaluated at fractions f1-f6
-    integ = I(f1, f2, f3, f4, f5, f6)
+    # Evaluate the RBF model in blocks of chunk_size combinations
+    starts = range(0, len(points), chunk_size)
+    
+    if n_jobs > 1 and len(starts) > 1 and (neighbors is not None or not use_numba):
+        with ThreadPoolExecutor(max_workers = n_jobs) as executor:
+            list(executor.map(evaluate_block, starts))
     
-    # If you are evaluating more than 6 dyes, (e.g 7), adjust line 233 as follows:
-    # integ = I(f1, f2, f3, f4, f5, f6, f7)
+    else:
+        for start in starts:
+            evaluate_block(start)
     
-    # Append the previous value to the integral storage array
-    integral.append(integ)
+    return LHE_points
 
 
-    ################### Find the covariance for all combinations ###################
+# Define function F to return the RBF model over entire wavelength domain for a single combination
 
-    # Calculate covariance between solar irradiance and F evaluated at fractions f1-f6
-    cov = np.cov(spectrum_regression(wavelength), F(f1, f2, f3, f4, f5, f6))
-    
-    # If you are evaluating more than 6 dyes, (e.g 7), adjust line 245 as follows:
-    # cov = np.cov(spectrum_regression(wavelength), F(f1, f2, f3, f4, f5, f6, f7))
+def F(I1, I2, I3, I4, I5, I6):
     
+    # If you are evaluating more than 6 dyes, (e.g 7), adjust the function as follows:
+    # def F(I1, I2, I3, I4, I5, I6, I7):
+    #     return F_all([[I1, I2, I3, I4, I5, I6, I7]])[0]
     
-    # Append the previous value to the covariance storage array
-    covariance.append(cov[0, 1])
+    return F_all([[I1, I2, I3, I4, I5, I6]])[0]
 
 
+# Evaluate the RBF model for all dye combinations in a single call
+LHE = F_all(np.stack([V1, V2, V3, V4, V5, V6], axis = 1))
 
+# If you are evaluating more than 6 dyes, (e.g 7), adjust the line above as follows:
+# LHE = F_all(np.stack([V1, V2, V3, V4, V5, V6, V7], axis = 1))
 
-################### Find characteristic values in correlation, integral & covariance arrays ###################
 
 
-################### Find best Pearson Correlation fit ###################
 
-# Store the maximum values of 'correlation' in a new array
-correlation_answer = list(np.where(correlation == max(correlation)))
+################### Evaluate fitment conditions for all dye possible combinations ###################
 
-# Check if there are muliple maximum values in 'correlation'
-if len(correlation_answer) > 1:
-    print('There are multiple correlation best fits. Print correlation_answer to verify.')
+# Note: Each fitment condition is calculated for every row of the LHE matrix at once
+
+# Calculate deviation of solar irradiance spectrum from its mean and the norm of this deviation
+solar_centered = solar - solar.mean()
+solar_norm = np.sqrt((solar_centered ** 2).sum())
+
+# Calculate deviation of every LHE spectrum from its mean
+LHE_centered = LHE - LHE.mean(axis = 1, keepdims = True)
+
+# Calculate sum of the products of the deviations of solar irradiance and every LHE spectrum
+# Note: This single matrix-vector product is shared by the correlation and covariance
+cross_deviation = LHE_centered @ solar_centered
+
+
+################### Find the Pearson Correlation for all combinations ###################
+
+# Calculate correlation between solar irradiance and F evaluated at every combination
+# Note: r = sum(dx * dy) / sqrt(sum(dx^2) * sum(dy^2)), where dx and dy are deviations from the mean
+correlation = cross_deviation / (np.sqrt((LHE_centered ** 2).sum(axis = 1)) * solar_norm)
+
+
+################### Find the integral value for all combinations ###################
+
+# Integrate F evaluated at every combination
+integral = trapezoid(LHE)
+
+
+################### Find the covariance for all combinations ###################
+
+# Calculate covariance between solar irradiance and F evaluated at every combination
+covariance = cross_deviation / (len(wavelength) - 1)
+
+
+
+
+################### Find characteristic values in correlation, integral & covariance arrays ###################
+
+# Define function to return the volume fractions of the combination at 'index' as a string
+def combination_label(index):
     
-else:
-    a = int(correlation_answer[0])
-    print('\n\nThe volume fractions of correlation best fit are:')
-    print(f'A={V1[a]:.1f}, B={V2[a]:.1f}, K={V3[a]:.1f}, M={V4[a]:.1f}, C={V5[a]:.1f}, P={V6[a]:.1f}\n')
+    return f'A={V1[index]:.1f}, B={V2[index]:.1f}, K={V3[index]:.1f}, M={V4[index]:.1f}, C={V5[index]:.1f}, P={V6[index]:.1f}'
     
-    # If you are evaluating more than 6 dyes, (e.g 7), adjust line 272 as follows:
-    # print(f'A={V1[a]:.1f}, B={V2[a]:.1f}, K={V3[a]:.1f}, M={V4[a]:.1f}, C={V5[a]:.1f}, P={V6[a]:.1f}, NEWDYE={V7[a]:.1f}\n')
+    # If you are evaluating more than 6 dyes, (e.g 7), adjust the line above as follows:
+    # return f'A={V1[index]:.1f}, B={V2[index]:.1f}, K={V3[index]:.1f}, M={V4[index]:.1f}, C={V5[index]:.1f}, P={V6[index]:.1f}, NEWDYE={V7[index]:.1f}'
 
-# Define function to plot correlation coefficient vs. the index of the volume fraction meshgrid if allow = True
-# Note: The red dot indicates the max value in the correlation vector. The combination assosciated with this
+# Define function to plot a fitment condition vs. the index of the volume fraction meshgrid if allow = True
+# Note: The red dot indicates the max value in the fitment vector. The combination assosciated with this
     # Max value index is printed as the figure subtitle
-def plotcorrelationcoefficient(allow = True):
+def plotfitment(values, index, number, ylabel, suptitle, allow = True):
         
     if allow:
         
-        plt.figure(1)
-        plt.plot(correlation)
-        plt.scatter(a, max(correlation), color = 'r')
+        plt.figure(number)
+        plt.plot(values)
+        plt.scatter(index, values[index], color = 'r')
         plt.xlabel('Volume Fraction Index')
-        plt.ylabel('Pearson Correlation Coefficient (Unitless)')
-        plt.suptitle('Correlation Coefficient vs. VF Index')
-        plt.title(f'A={V1[a]:.1f}, B={V2[a]:.1f}, K={V3[a]:.1f}, M={V4[a]:.1f}, C={V5[a]:.1f}, P={V6[a]:.1f}',
-                  fontsize = 10)
-        #plt.savefig('Correlation_Plot', dpi = 500)
-        
-        # If you are evaluating more than 6 dyes, (e.g 7), adjust line 290 as follows:
-        # plt.title(f'A={V1[a]:.1f}, B={V2[a]:.1f}, K={V3[a]:.1f}, M={V4[a]:.1f}, C={V5[a]:.1f}, P={V6[a]:.1f, NEWDYE={V7[a]:.1f}', fontsize = 10)
+        plt.ylabel(ylabel)
+        plt.suptitle(suptitle)
+        plt.title(combination_label(index), fontsize = 10)
+        #plt.savefig(suptitle.split()[0] + '_Plot', dpi = 500)
 
     if not allow: pass
 
-# Option to plot correlation coefficient vs. volume fraction index
-plotcorrelationcoefficient(allow = True)
-
-# Define function to plot the LHE of the combination optimized by correlation fitment vs. the solar irradiance spectrum
-def plotcorrelationcombination(allow = True):
+# Define function to plot the LHE of the combination at 'index' vs. the solar irradiance spectrum if allow = True
+# Note: The LHE spectrum is taken from the LHE matrix of the sweep, so the RBF model is not evaluated again
+    # The inverse multiquadric interpolant can undershoot zero between measured combinations even though the
+    # absorbance data is clipped, so negative LHE values are still clipped for plotting
+def plotcombination(index, suptitle, allow = True):
     
     if allow:
         
-        fig2, ax2 = plt.subplots()
-        ax21 = ax2.twinx()
-        ax2.plot(wavelength, np.clip(F(V1[a], V2[a], V3[a], V4[a], V5[a], V6[a]), 0, None),
-                 label = 'LHE Spectrum', color = 'orange')
-        ax21.plot(wavelength, spectrum_regression(wavelength), label = 'Solar Irradiance')
-        ax2.set_xlabel('Wavelength (nm)')
-        ax2.set_ylabel('Light Harvesting Efficency (Unitless)')
-        ax21.set_ylabel('Solar Irradiance (W*m$^{-2}$*nm$^{-1}$)')
-        plt.suptitle('Correlation Fitment')
-        plt.title(f'A={V1[a]:.1f}, B={V2[a]:.1f}, K={V3[a]:.1f}, M={V4[a]:.1f}, C={V5[a]:.1f}, P={V6[a]:.1f}',
-                  fontsize = 10)
-        fig2.legend(bbox_to_anchor = (0.9, 0.75), loc = 'lower right', prop = {"size" : 8})
+        fig, ax = plt.subplots()
+        ax1 = ax.twinx()
+        ax.plot(wavelength, np.clip(LHE[index], 0, None), label = 'LHE Spectrum', color = 'orange')
+        ax1.plot(wavelength, solar, label = 'Solar Irradiance')
+        ax.set_xlabel('Wavelength (nm)')
+        ax.set_ylabel('Light Harvesting Efficency (Unitless)')
+        ax1.set_ylabel('Solar Irradiance (W*m$^{-2}$*nm$^{-1}$)')
+        plt.suptitle(suptitle)
+        plt.title(combination_label(index), fontsize = 10)
+        fig.legend(bbox_to_anchor = (0.9, 0.75), loc = 'lower right', prop = {"size" : 8})
         plt.show()
-        #fig.savefig(Correlation_Fitment, dpi = 500)
-        
-        # If you are evaluating more than 6 dyes, (e.g 7), adjust lines 309 and 316 as follows:
-        # ax2.plot(wavelength, np.clip(F(V1[a], V2[a], V3[a], V4[a], V5[a], V6[a], V7[a]), 0, None), label = 'LHE Spectrum', color = 'orange')
-        # plt.title(f'A={V1[a]:.1f}, B={V2[a]:.1f}, K={V3[a]:.1f}, M={V4[a]:.1f}, C={V5[a]:.1f}, P={V6[a]:.1f, NEWDYE={V7[a]:.1f}', fontsize = 10)
+        #fig.savefig(suptitle.replace(' ', '_'), dpi = 500)
    
     if not allow: pass
 
+
+################### Find best Pearson Correlation fit ###################
+
+# Find the index of the (first) maximum value of 'correlation'
+a = int(np.argmax(correlation))
+
+# Store the indices of all maximum values of 'correlation' in a new array
+correlation_answer = np.flatnonzero(correlation == correlation[a])
+
+# Check if there are muliple maximum values in 'correlation'
+if len(correlation_answer) > 1:
+    print('There are multiple correlation best fits. Print correlation_answer to verify.')
+    
+else:
+    print('\n\nThe volume fractions of correlation best fit are:')
+    print(f'{combination_label(a)}\n')
+
+# Option to plot correlation coefficient vs. volume fraction index
+plotfitment(correlation, a, 1, 'Pearson Correlation Coefficient (Unitless)', 'Correlation Coefficient vs. VF Index', allow = True)
+
 # Option to plot LHE of combination that maximizes the correlation fitment
-plotcorrelationcombination(allow = True)
+plotcombination(a, 'Correlation Fitment', allow = True)
     
 
 
 
 ################### Find best integral fit ###################
 
-# Store the maximum values of 'integral' in a new array
-integral_answer = list(np.where(integral == max(integral)))
+# Find the index of the (first) maximum value of 'integral'
+b = int(np.argmax(integral))
+
+# Store the indices of all maximum values of 'integral' in a new array
+integral_answer = np.flatnonzero(integral == integral[b])
 
 # Check if there are muliple maximum values in 'integral'
 if len(integral_answer) > 1:
     print('There are multiple integral best fits. Print integral_answer to verify.')
     
 else:
-    b = int(integral_answer[0])
     print('The volume fractions of integral best fit are:')
-    print(f'A={V1[b]:.1f}, B={V2[b]:.1f}, K={V3[b]:.1f}, M={V4[b]:.1f}, C={V5[b]:.1f}, P={V6[b]:.1f}\n')
-    
-    # If you are evaluating more than 6 dyes, (e.g 7), adjust line 346 as follows:
-    # print(f'A={V1[b]:.1f}, B={V2[b]:.1f}, K={V3[b]:.1f}, M={V4[b]:.1f}, C={V5[b]:.1f}, P={V6[b]:.1f}, NEWDYE={V7[b]:.1f}\n')
-    
-# Define function to plot the absorbance integral vs. the index of the volume fraction meshgrid if allow = True
-# Note: The red dot indicates the max value in the integral vector. The combination assosciated with this
-    # Max value index is printed as the figure subtitle
-def plotintegralfit(allow = True):
-        
-    if allow:
-        
-        plt.figure(3)   
-        plt.plot(integral)
-        plt.scatter(b, max(integral), color = 'r')
-        plt.xlabel('Volume Fraction Index')
-        plt.ylabel('Spectrum Integral (nm)')
-        plt.suptitle('Integral Value vs. VF Index')
-        plt.title(f'A={V1[b]:.1f}, B={V2[b]:.1f}, K={V3[b]:.1f}, M={V4[b]:.1f}, C={V5[b]:.1f}, P={V6[b]:.1f}',
-                  fontsize = 10)
-        #plt.savefig('Integral_Plot', dpi = 500)
-        
-        # If you are evaluating more than 6 dyes, (e.g 7), adjust line 364 as follows:
-        # plt.title(f'A={V1[b]:.1f}, B={V2[b]:.1f}, K={V3[b]:.1f}, M={V4[b]:.1f}, C={V5[b]:.1f}, P={V6[b]:.1f, NEWDYE={V7[b]:.1f}', fontsize = 10)
-
-    if not allow: pass
+    print(f'{combination_label(b)}\n')
     
 # Option to plot absorbance integral vs. volume fraction index
-plotintegralfit(allow = True) 
-    
-# Define function to plot the LHE of the combination optimized by integral fitment vs. the solar irradiance spectrum
-def plotintegralcombination(allow = True):
-    
-    if allow:
-        
-        fig4, ax4 = plt.subplots()
-        ax41 = ax4.twinx()
-        ax4.plot(wavelength, np.clip(F(V1[b], V2[b], V3[b], V4[b], V5[b], V6[b]), 0, None),
-                 label = 'LHE Spectrum', color = 'orange')
-        ax41.plot(wavelength, spectrum_regression(wavelength), label = 'Solar Irradiance')
-        ax4.set_xlabel('Wavelength (nm)')
-        ax4.set_ylabel('Light Harvesting Efficency (Unitless)')
-        ax41.set_ylabel('Solar Irradiance (W*m$^{-2}$*nm$^{-1}$)')
-        plt.suptitle('Integral Fitment')
-        plt.title(f'A={V1[b]:.1f}, B={V2[b]:.1f}, K={V3[b]:.1f}, M={V4[b]:.1f}, C={V5[b]:.1f}, P={V6[b]:.1f}',
-                  fontsize = 10)
-        fig4.legend(bbox_to_anchor = (0.9, 0.75), loc = 'lower right', prop = {"size" : 8})
-        plt.show()
-        #fig.savefig(Integral_Fitment, dpi = 500)
-        
-        # If you are evaluating more than 6 dyes, (e.g 7), adjust lines 383 and 390 as follows:
-        # ax2.plot(wavelength, np.clip(F(V1[b], V2[b], V3[b], V4[b], V5[b], V6[b], V7[b]), 0, None), label = 'LHE Spectrum', color = 'orange')
-        # plt.title(f'A={V1[b]:.1f}, B={V2[b]:.1f}, K={V3[b]:.1f}, M={V4[b]:.1f}, C={V5[b]:.1f}, P={V6[b]:.1f, NEWDYE={V7[b]:.1f}', fontsize = 10)
-   
-    if not allow: pass
+plotfitment(integral, b, 3, 'Spectrum Integral (nm)', 'Integral Value vs. VF Index', allow = True)
 
 # Option to plot LHE of combination that maximizes the integral fitment
-plotintegralcombination(allow = True)
+plotcombination(b, 'Integral Fitment', allow = True)
 
 
 ################### Find best covariance fit ###################
 
-# Store the maximum values of 'covariance' in a new array
-covariance_answer = list(np.where(covariance == max(covariance)))
+# Find the index of the (first) maximum value of 'covariance'
+c = int(np.argmax(covariance))
+
+# Store the indices of all maximum values of 'covariance' in a new array
+covariance_answer = np.flatnonzero(covariance == covariance[c])
 
 # Check if there are muliple maximum values in 'covariance'
 if len(covariance_answer) > 1:
     print('There are multiple covariance best fits. Print covariance_answer to verify.')
     
 else:
-    c = int(covariance_answer[0])
     print('The volume fractions of covariance best fit are:')
-    print(f'A={V1[c]:.1f}, B={V2[c]:.1f}, K={V3[c]:.1f}, M={V4[c]:.1f}, C={V5[c]:.1f}, P={V6[c]:.1f}\n')
-    
-    # If you are evaluating more than 6 dyes, (e.g 7), adjust line 418 as follows:
-    # print(f'A={V1[c]:.1f}, B={V2[c]:.1f}, K={V3[c]:.1f}, M={V4[c]:.1f}, C={V5[c]:.1f}, P={V6[c]:.1f}, NEWDYE={V7[c]:.1f}\n')
-
-# Define function to plot absorbance covariance vs. the index of the volume fraction meshgrid if allow = True
-# Note: The red dot indicates the max value in the covariance vector. The combination assosciated with this
-    # Max value index is printed as the figure subtitle
-def plotcovariancefit(allow = True):
-        
-    if allow:
-        
-        plt.figure(5)
-        plt.plot(covariance)
-        plt.scatter(c, max(covariance), color = 'r')
-        plt.xlabel('Volume Fraction Index')
-        plt.ylabel('Covariance (nm)')
-        plt.suptitle('Covariance vs. VF Index')
-        plt.title(f'A={V1[c]:.1f}, B={V2[c]:.1f}, K={V3[c]:.1f}, M={V4[c]:.1f}, C={V5[c]:.1f}, P={V6[c]:.1f}',
-                  fontsize = 10)
-        #plt.savefig('Covariance_Plot', dpi = 500)
-        
-        # If you are evaluating more than 6 dyes, (e.g 7), adjust line 436 as follows:
-        # plt.title(f'A={V1[c]:.1f}, B={V2[c]:.1f}, K={V3[c]:.1f}, M={V4[c]:.1f}, C={V5[c]:.1f}, P={V6[c]:.1f, NEWDYE={V7[c]:.1f}', fontsize = 10)
-
-       
-    if not allow: pass
+    print(f'{combination_label(c)}\n')
     
 # Option to plot covariance vs. volume fraction index
-plotcovariancefit(allow = True)     
+plotfitment(covariance, c, 5, 'Covariance (nm)', 'Covariance vs. VF Index', allow = True)
 
-# Define function to plot the LHE of the combination optimized by covariance fitment vs. the solar irradiance spectrum
-def plotcovariancecombination(allow = True):
-    
-    if allow:
-        
-        fig6, ax6 = plt.subplots()
-        ax61 = ax6.twinx()
-        ax6.plot(wavelength, np.clip(F(V1[c], V2[c], V3[c], V4[c], V5[c], V6[c]), 0, None),
-                 label = 'LHE Spectrum', color = 'orange')
-        ax61.plot(wavelength, spectrum_regression(wavelength), label = 'Solar Irradiance')
-        ax6.set_xlabel('Wavelength (nm)')
-        ax6.set_ylabel('Light Harvesting Efficency (Unitless)')
-        ax61.set_ylabel('Solar Irradiance (W*m$^{-2}$*nm$^{-1}$)')
-        plt.suptitle('Covariance Fitment')
-        plt.title(f'A={V1[c]:.1f}, B={V2[c]:.1f}, K={V3[c]:.1f}, M={V4[c]:.1f}, C={V5[c]:.1f}, P={V6[c]:.1f}',
-                  fontsize = 10)
-        fig6.legend(bbox_to_anchor = (0.9, 0.75), loc = 'lower right', prop = {"size" : 8})
-        plt.show()
-        #fig.savefig(ovariance_Fitment, dpi = 500)
-        
-        # If you are evaluating more than 6 dyes, (e.g 7), adjust lines 456 and 463 as follows:
-        # ax2.plot(wavelength, np.clip(F(V1[c], V2[c], V3[c], V4[c], V5[c], V6[c], V7[c]), 0, None), label = 'LHE Spectrum', color = 'orange')
-        # plt.title(f'A={V1[c]:.1f}, B={V2[c]:.1f}, K={V3[c]:.1f}, M={V4[c]:.1f}, C={V5[c]:.1f}, P={V6[c]:.1f, NEWDYE={V7[c]:.1f}', fontsize = 10)
-   
-    if not allow: pass
-
-# Option to plot LHE of combination that maximizes the integral fitment
-plotcovariancecombination(allow = True)
\ No newline at end of file
+# Option to plot LHE of combination that maximizes the covariance fitment
+plotcombination(c, 'Covariance Fitment', allow = True)